@@ -1,11 +1,15 @@
 """
 Application configuration loaded from environment variables.
 
-Uses pydantic-settings to validate and parse .env values at startup.
+Uses pydantic-settings to validate and parse .env values.  Settings are
+built lazily on the first ``get_settings()`` call and cached for the
+process; tests can call ``get_settings.cache_clear()`` to re-read them.
 """
 
 from __future__ import annotations
 
+import functools
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -24,6 +28,7 @@ class Settings(BaseSettings):
     # ── OpenRouter / AI ─────────────────────────────────────────
     OPENROUTER_API_KEY: str
     AI_MODEL: str = "anthropic/claude-sonnet-4.6"
+    AI_CONTEXT_WINDOW: int = 200_000  # tokens; must match AI_MODEL
 
     # ── Admin ───────────────────────────────────────────────────
     ADMIN_IDS: str = ""  # comma-separated Telegram user IDs
@@ -39,12 +44,15 @@ class Settings(BaseSettings):
     PORT: int = 8080
 
     # ── Helpers ─────────────────────────────────────────────────
-    @property
-    def admin_ids_list(self) -> list[int]:
-        """Parse ADMIN_IDS into a list of integers."""
-        if not self.ADMIN_IDS.strip():
-            return []
-        return [int(uid.strip()) for uid in self.ADMIN_IDS.split(",") if uid.strip()]
-
-
-settings = Settings()  # type: ignore[call-arg]
+    @functools.cached_property
+    def admin_ids_set(self) -> frozenset[int]:
+        """Parse ADMIN_IDS into a set of integers (computed once)."""
+        return frozenset(
+            int(uid) for uid in self.ADMIN_IDS.split(",") if uid.strip()
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide ``Settings`` instance (created on first use)."""
+    return Settings()  # type: ignore[call-arg]
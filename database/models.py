@@ -10,10 +10,26 @@ Tables
 from __future__ import annotations
 
 import datetime
-import json
-
-from sqlalchemy import BigInteger, Boolean, Date, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from collections import deque
+
+import orjson
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    mapped_column,
+    reconstructor,
+    relationship,
+)
 
 
 class Base(DeclarativeBase):
@@ -37,6 +53,15 @@ class User(Base):
     active_profile_id: Mapped[int | None] = mapped_column(
         Integer, ForeignKey("threads_profiles.id", ondelete="SET NULL"), nullable=True
     )
+    # Denormalized len(profiles), kept in sync by the create/delete handlers
+    profile_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+
+    # Many-to-one: user → currently selected profile
+    active_profile: Mapped[ThreadsProfile | None] = relationship(
+        "ThreadsProfile", foreign_keys=[active_profile_id], post_update=True,
+    )
 
     # One-to-many: user → profiles
     profiles: Mapped[list[ThreadsProfile]] = relationship(
@@ -55,6 +80,7 @@ class ThreadsProfile(Base):
     """A chat slot: named persona with system prompt and conversation context."""
 
     __tablename__ = "threads_profiles"
+    __table_args__ = (Index("ix_threads_profiles_user_id", "user_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
@@ -71,26 +97,43 @@ class ThreadsProfile(Base):
     # ── Context helpers ─────────────────────────────────────────────
     MAX_CONTEXT_MESSAGES: int = 10  # pairs (user+assistant = 2 entries each)
 
-    def get_context(self) -> list[dict[str, str]]:
-        """Deserialize stored context."""
-        try:
-            return json.loads(self.context_json or "[]")
-        except json.JSONDecodeError:
-            return []
+    # Deserialized ``context_json``, built lazily and kept for the lifetime
+    # of the instance so each turn parses/serializes the context only once.
+    _ctx_cache = None
+
+    @reconstructor
+    def _init_on_load(self) -> None:
+        """Drop any cached context when the row is (re)loaded from the DB."""
+        self._ctx_cache = None
+
+    def get_context(self) -> deque[dict[str, str]]:
+        """Deserialize stored context (cached on the instance).
+
+        The deque is bounded to MAX_CONTEXT_MESSAGES pairs, so appending
+        past the limit evicts the oldest entries automatically.
+        """
+        if self._ctx_cache is None:
+            raw = self.context_json
+            try:
+                # New and freshly cleared chats need no parse at all
+                entries = orjson.loads(raw) if raw and raw != "[]" else ()
+            except orjson.JSONDecodeError:
+                entries = ()
+            self._ctx_cache = deque(
+                entries, maxlen=self.MAX_CONTEXT_MESSAGES * 2
+            )
+        return self._ctx_cache
 
     def add_to_context(self, user_msg: str, assistant_msg: str) -> None:
-        """Append a user/assistant pair and trim to MAX_CONTEXT_MESSAGES pairs."""
+        """Append a user/assistant pair, keeping the last MAX_CONTEXT_MESSAGES pairs."""
         ctx = self.get_context()
         ctx.append({"role": "user", "content": user_msg})
         ctx.append({"role": "assistant", "content": assistant_msg})
-        # Keep last N*2 entries (N pairs)
-        max_entries = self.MAX_CONTEXT_MESSAGES * 2
-        if len(ctx) > max_entries:
-            ctx = ctx[-max_entries:]
-        self.context_json = json.dumps(ctx, ensure_ascii=False)
+        self.context_json = orjson.dumps(list(ctx)).decode()
 
     def clear_context(self) -> None:
         """Reset conversation context."""
+        self._ctx_cache = None
         self.context_json = "[]"
 
     def __repr__(self) -> str:
@@ -8,29 +8,48 @@ Usage
     async with async_session() as session:
         ...
 
-Call ``init_db()`` once at application startup to create tables.
+Call ``init_db()`` once at application startup to create tables (and to
+upgrade databases created by older versions of the bot).
 """
 
 from __future__ import annotations
 
+from sqlalchemy import Connection, event, inspect, text
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 
-from config import settings
-from database.models import Base
+from config import get_settings
+from database.models import Base, ThreadsProfile
 
 engine = create_async_engine(
-    settings.DATABASE_URL,
+    get_settings().DATABASE_URL,
     echo=False,
     # SQLite-specific: allow the same connection across coroutines.
     connect_args={"check_same_thread": False}
-    if settings.DATABASE_URL.startswith("sqlite")
+    if get_settings().DATABASE_URL.startswith("sqlite")
     else {},
 )
 
+if get_settings().DATABASE_URL.startswith("sqlite"):
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _connection_record) -> None:
+        """Tune every new SQLite connection for many small commits.
+
+        WAL lets readers run alongside the writer, and ``synchronous=NORMAL``
+        drops the per-commit fsync (still crash-safe in WAL mode).
+        """
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.close()
+
+
 async_session: async_sessionmaker[AsyncSession] = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -39,6 +58,30 @@ async_session: async_sessionmaker[AsyncSession] = async_sessionmaker(
 
 
 async def init_db() -> None:
-    """Create all tables that do not yet exist."""
+    """Create all tables that do not yet exist and upgrade older schemas."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+
+
+def _upgrade_schema(conn: Connection) -> None:
+    """Add columns/indexes introduced after a database was first created.
+
+    ``create_all`` only creates missing tables, so existing tables are
+    patched here.  Every step is idempotent.
+    """
+    user_columns = {col["name"] for col in inspect(conn).get_columns("users")}
+    if "profile_count" not in user_columns:
+        conn.execute(text(
+            "ALTER TABLE users "
+            "ADD COLUMN profile_count INTEGER NOT NULL DEFAULT 0"
+        ))
+        # Backfill from the existing chat slots
+        conn.execute(text(
+            "UPDATE users SET profile_count = ("
+            "SELECT COUNT(*) FROM threads_profiles "
+            "WHERE threads_profiles.user_id = users.id)"
+        ))
+
+    for index in ThreadsProfile.__table__.indexes:
+        index.create(conn, checkfirst=True)
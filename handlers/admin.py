@@ -12,10 +12,9 @@ import logging
 
 from aiogram import Router, types
 from aiogram.filters import Command
-from aiogram.enums import ParseMode
 from sqlalchemy import select
 
-from config import settings
+from config import get_settings
 from database.models import User
 from database.session import async_session
 
@@ -25,7 +24,7 @@ router = Router(name="admin")
 
 def _is_admin(user_id: int) -> bool:
     """Check whether *user_id* is listed in ADMIN_IDS."""
-    return user_id in settings.admin_ids_list
+    return user_id in get_settings().admin_ids_set
 
 
 # ── /admin_promote ──────────────────────────────────────────────────────
@@ -46,7 +45,6 @@ async def cmd_admin_promote(message: types.Message) -> None:
     if not args:
         await message.answer(
             "Использование: <code>/admin_promote &lt;telegram_id&gt;</code>",
-            parse_mode=ParseMode.HTML,
         )
         return
 
@@ -65,14 +63,12 @@ async def cmd_admin_promote(message: types.Message) -> None:
             await message.answer(
                 f"❌ Пользователь с Telegram ID <code>{target_tg_id}</code> не найден.\n"
                 "Ему нужно сначала написать /start боту.",
-                parse_mode=ParseMode.HTML,
             )
             return
 
         if user.is_pro:
             await message.answer(
                 f"ℹ️ Пользователь <code>{target_tg_id}</code> уже Pro.",
-                parse_mode=ParseMode.HTML,
             )
             return
 
@@ -87,5 +83,4 @@ async def cmd_admin_promote(message: types.Message) -> None:
 
         await message.answer(
             f"✅ Пользователь <code>{target_tg_id}</code> получил статус <b>Pro</b>!",
-            parse_mode=ParseMode.HTML,
         )
@@ -7,19 +7,24 @@ context memory per slot, and context/profile management commands.
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
 import re
+from collections.abc import Coroutine
+from typing import Any, Final
 
 from aiogram import F, Router, types
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
 from aiogram.filters import Command, CommandStart
-from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import select, func
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import settings
-from database.models import ThreadsProfile
+from config import get_settings
+from database.models import ThreadsProfile, User
 from database.session import async_session
 from services.ai import generate_thread
 from services.usage import (
@@ -32,6 +37,21 @@ logger = logging.getLogger(__name__)
 router = Router(name="user")
 
 MAX_CHATS = 5
+MAX_MESSAGE_LEN = 4000  # stay under Telegram's 4096-char message limit
+STREAM_EDIT_INTERVAL = 1.0  # seconds between edits of a streaming reply
+
+# ── Static message texts ────────────────────────────────────────────────
+
+CHATS_MENU_TEXT: Final[str] = (
+    "📋 <b>Ваши чаты:</b>\n"
+    "🟢 — активный чат\n\n"
+    "Выберите чат или создайте новый:"
+)
+CREATE_CHAT_TEXT: Final[str] = (
+    "📝 <b>Создание нового чата</b>\n\n"
+    "Шаг 1/2: Как назовём чат?\n\n"
+    "Примеры: <i>IT Блог, Мотивация, Бизнес, Лайфстайл, Юмор</i>"
+)
 
 
 # ── FSM States ──────────────────────────────────────────────────────────
@@ -50,39 +70,50 @@ class EditStyle(StatesGroup):
 
 
 async def build_chats_keyboard(
-    user_id: int, session=None
+    user_id: int, session: AsyncSession | None = None
 ) -> InlineKeyboardMarkup:
     """Build inline keyboard with user's chat slots."""
-    own_session = session is None
-    if own_session:
-        session = async_session()
-        ctx = session
-    else:
-        from contextlib import asynccontextmanager
+    if session is None:
+        async with async_session() as own_session:
+            return await _build_chats_keyboard(own_session, user_id)
+    return await _build_chats_keyboard(session, user_id)
 
-        @asynccontextmanager
-        async def _noop():
-            yield session
 
-        ctx = _noop()
+async def _build_chats_keyboard(
+    session: AsyncSession, user_id: int
+) -> InlineKeyboardMarkup:
+    """Load the user's chat slots and render them."""
+    user = await get_or_create_user(session, user_id)
+    stmt = select(ThreadsProfile).where(ThreadsProfile.user_id == user.id)
+    result = await session.execute(stmt)
+    profiles = result.scalars().all()
+
+    return _render_chats_keyboard(
+        tuple((p.id, p.profile_name) for p in profiles),
+        user.active_profile_id,
+    )
 
-    async with ctx:
-        user = await get_or_create_user(session, user_id)
-        stmt = select(ThreadsProfile).where(ThreadsProfile.user_id == user.id)
-        result = await session.execute(stmt)
-        profiles = result.scalars().all()
 
+@functools.lru_cache(maxsize=1024)
+def _render_chats_keyboard(
+    chats: tuple[tuple[int, str], ...], active_id: int | None
+) -> InlineKeyboardMarkup:
+    """Render the chat-slot keyboard for ``(id, name)`` pairs.
+
+    The arguments fully determine the markup, so identical menus (the common
+    case of re-opening /chats) reuse the same immutable object.
+    """
     buttons: list[list[InlineKeyboardButton]] = []
-    for p in profiles:
-        prefix = "🟢" if user.active_profile_id == p.id else "📝"
+    for chat_id, name in chats:
+        prefix = "🟢" if active_id == chat_id else "📝"
         buttons.append([
             InlineKeyboardButton(
-                text=f"{prefix} {p.profile_name}",
-                callback_data=f"select_chat:{p.id}",
+                text=f"{prefix} {name}",
+                callback_data=f"select_chat:{chat_id}",
             )
         ])
 
-    if len(profiles) < MAX_CHATS:
+    if len(chats) < MAX_CHATS:
         buttons.append([
             InlineKeyboardButton(
                 text="➕ Создать новый чат",
@@ -93,34 +124,41 @@ async def build_chats_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def active_chat_keyboard() -> InlineKeyboardMarkup:
-    """Buttons shown when inside an active chat."""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✏️ Редактировать стиль", callback_data="edit_style"),
-            InlineKeyboardButton(text="🗑 Очистить контекст", callback_data="clear_context"),
-        ],
-        [
-            InlineKeyboardButton(text="🔀 Сменить чат", callback_data="switch_chat"),
-            InlineKeyboardButton(text="🗑 Удалить чат", callback_data="delete_chat"),
-        ],
-    ])
+# Buttons shown when inside an active chat.
+ACTIVE_CHAT_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✏️ Редактировать стиль", callback_data="edit_style"),
+        InlineKeyboardButton(text="🗑 Очистить контекст", callback_data="clear_context"),
+    ],
+    [
+        InlineKeyboardButton(text="🔀 Сменить чат", callback_data="switch_chat"),
+        InlineKeyboardButton(text="🗑 Удалить чат", callback_data="delete_chat"),
+    ],
+])
+
+
+# Markdown cleanup passes, precompiled once and applied in order (each pass
+# sees the output of the previous one).
+_MD_PASSES: tuple[tuple[re.Pattern[str], str], ...] = (
+    # Bold **text** / __text__
+    (re.compile(r"\*\*(.+?)\*\*"), r"\1"),
+    (re.compile(r"__(.+?)__"), r"\1"),
+    # Italic *text* / _text_
+    (re.compile(r"\*(.+?)\*"), r"\1"),
+    (re.compile(r"(?<!\w)_(.+?)_(?!\w)"), r"\1"),
+    # Headers ### / ## / #
+    (re.compile(r"^#{1,6}\s*", re.MULTILINE), ""),
+    # Blockquote >
+    (re.compile(r"^>\s?", re.MULTILINE), ""),
+    # Code backticks
+    (re.compile(r"`{1,3}"), ""),
+)
 
 
 def strip_markdown(text: str) -> str:
     """Remove markdown formatting symbols from AI output."""
-    # Remove bold **text** / __text__
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-    text = re.sub(r'__(.+?)__', r'\1', text)
-    # Remove italic *text* / _text_
-    text = re.sub(r'\*(.+?)\*', r'\1', text)
-    text = re.sub(r'(?<!\w)_(.+?)_(?!\w)', r'\1', text)
-    # Remove headers ### / ## / #
-    text = re.sub(r'^#{1,6}\s*', '', text, flags=re.MULTILINE)
-    # Remove blockquote >
-    text = re.sub(r'^>\s?', '', text, flags=re.MULTILINE)
-    # Remove code backticks
-    text = re.sub(r'`{1,3}', '', text)
+    for pattern, repl in _MD_PASSES:
+        text = pattern.sub(repl, text)
     return text.strip()
 
 
@@ -139,8 +177,7 @@ async def cmd_start(message: types.Message, state: FSMContext) -> None:
         "👋 <b>Добро пожаловать в Threads Copilot!</b>\n\n"
         "Выберите чат или создайте новый.\n"
         "Каждый чат — это отдельный стиль генерации с памятью контекста.\n\n"
-        f"🆓 Бесплатно: <b>{settings.DAILY_FREE_LIMIT}</b> запросов/день",
-        parse_mode=ParseMode.HTML,
+        f"🆓 Бесплатно: <b>{get_settings().DAILY_FREE_LIMIT}</b> запросов/день",
         reply_markup=kb,
     )
 
@@ -155,10 +192,7 @@ async def cmd_chats(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     kb = await build_chats_keyboard(message.from_user.id)
     await message.answer(
-        "📋 <b>Ваши чаты:</b>\n"
-        "🟢 — активный чат\n\n"
-        "Выберите чат или создайте новый:",
-        parse_mode=ParseMode.HTML,
+        CHATS_MENU_TEXT,
         reply_markup=kb,
     )
 
@@ -170,21 +204,18 @@ async def cmd_chats(message: types.Message, state: FSMContext) -> None:
 async def cmd_clear(message: types.Message) -> None:
     """Clear context of the active chat."""
     async with async_session() as session:
-        user = await get_or_create_user(session, message.from_user.id)
+        user = await get_or_create_user(
+            session, message.from_user.id, load_active=True
+        )
         if not user.active_profile_id:
             await message.answer("⚠️ Сначала выберите чат через /chats")
             return
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
+        profile = user.active_profile
         if profile:
             profile.clear_context()
             await session.commit()
             await message.answer(
                 f"🗑 Контекст чата <b>{profile.profile_name}</b> очищен!",
-                parse_mode=ParseMode.HTML,
             )
         else:
             await message.answer("⚠️ Чат не найден. Выберите через /chats")
@@ -206,10 +237,10 @@ async def cmd_pro_status(message: types.Message) -> None:
     else:
         text = (
             f"🆓 <b>Бесплатный</b> план\n"
-            f"Осталось запросов сегодня: <b>{remaining}</b> / {settings.DAILY_FREE_LIMIT}"
+            f"Осталось запросов сегодня: <b>{remaining}</b> / {get_settings().DAILY_FREE_LIMIT}"
         )
 
-    await message.answer(text, parse_mode=ParseMode.HTML)
+    await message.answer(text)
 
 
 # ── Callback: select chat ───────────────────────────────────────────────
@@ -223,14 +254,9 @@ async def cb_select_chat(callback: types.CallbackQuery, state: FSMContext) -> No
 
     async with async_session() as session:
         user = await get_or_create_user(session, callback.from_user.id)
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == profile_id,
-            ThreadsProfile.user_id == user.id,
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
+        profile = await session.get(ThreadsProfile, profile_id)
 
-        if not profile:
+        if not profile or profile.user_id != user.id:
             await callback.answer("❌ Чат не найден", show_alert=True)
             return
 
@@ -241,8 +267,7 @@ async def cb_select_chat(callback: types.CallbackQuery, state: FSMContext) -> No
         f"🟢 Активный чат: <b>{profile.profile_name}</b>\n\n"
         f"🎭 Стиль: <i>{profile.system_prompt[:100]}{'…' if len(profile.system_prompt) > 100 else ''}</i>\n\n"
         "Отправьте тему — и я создам пост!",
-        parse_mode=ParseMode.HTML,
-        reply_markup=active_chat_keyboard(),
+        reply_markup=ACTIVE_CHAT_KB,
     )
     await callback.answer()
 
@@ -255,13 +280,7 @@ async def cb_create_chat(callback: types.CallbackQuery, state: FSMContext) -> No
     """Start FSM for creating a new chat slot."""
     async with async_session() as session:
         user = await get_or_create_user(session, callback.from_user.id)
-        count_stmt = (
-            select(func.count())
-            .select_from(ThreadsProfile)
-            .where(ThreadsProfile.user_id == user.id)
-        )
-        count_result = await session.execute(count_stmt)
-        count = count_result.scalar() or 0
+        count = user.profile_count
 
     if count >= MAX_CHATS:
         await callback.answer(
@@ -272,10 +291,7 @@ async def cb_create_chat(callback: types.CallbackQuery, state: FSMContext) -> No
 
     await state.set_state(ChatCreation.waiting_name)
     await callback.message.edit_text(
-        "📝 <b>Создание нового чата</b>\n\n"
-        "Шаг 1/2: Как назовём чат?\n\n"
-        "Примеры: <i>IT Блог, Мотивация, Бизнес, Лайфстайл, Юмор</i>",
-        parse_mode=ParseMode.HTML,
+        CREATE_CHAT_TEXT,
     )
     await callback.answer()
 
@@ -303,7 +319,6 @@ async def fsm_chat_name(message: types.Message, state: FSMContext) -> None:
         "• <i>Пиши мотивационные посты как лайф-коуч</i>\n"
         "• <i>Генерируй IT-контент просто и с юмором</i>\n"
         "• <i>Пиши как предприниматель, коротко и по делу</i>",
-        parse_mode=ParseMode.HTML,
     )
 
 
@@ -333,6 +348,8 @@ async def fsm_chat_style(message: types.Message, state: FSMContext) -> None:
         await session.flush()  # get profile.id
 
         user.active_profile_id = profile.id
+        # Incremented by the database, not from a possibly cached value
+        user.profile_count = User.profile_count + 1
         await session.commit()
 
     await state.clear()
@@ -340,8 +357,7 @@ async def fsm_chat_style(message: types.Message, state: FSMContext) -> None:
         f"🎉 Чат <b>{name}</b> создан и активирован!\n\n"
         f"🎭 Стиль: <i>{style[:100]}{'…' if len(style) > 100 else ''}</i>\n\n"
         "Теперь просто отправьте тему для генерации поста.",
-        parse_mode=ParseMode.HTML,
-        reply_markup=active_chat_keyboard(),
+        reply_markup=ACTIVE_CHAT_KB,
     )
 
 
@@ -352,15 +368,13 @@ async def fsm_chat_style(message: types.Message, state: FSMContext) -> None:
 async def cb_clear_context(callback: types.CallbackQuery) -> None:
     """Clear context of the active chat."""
     async with async_session() as session:
-        user = await get_or_create_user(session, callback.from_user.id)
+        user = await get_or_create_user(
+            session, callback.from_user.id, load_active=True
+        )
         if not user.active_profile_id:
             await callback.answer("⚠️ Нет активного чата", show_alert=True)
             return
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
+        profile = user.active_profile
         if profile:
             profile.clear_context()
             await session.commit()
@@ -378,10 +392,7 @@ async def cb_switch_chat(callback: types.CallbackQuery, state: FSMContext) -> No
     await state.clear()
     kb = await build_chats_keyboard(callback.from_user.id)
     await callback.message.edit_text(
-        "📋 <b>Ваши чаты:</b>\n"
-        "🟢 — активный чат\n\n"
-        "Выберите чат или создайте новый:",
-        parse_mode=ParseMode.HTML,
+        CHATS_MENU_TEXT,
         reply_markup=kb,
     )
     await callback.answer()
@@ -394,24 +405,21 @@ async def cb_switch_chat(callback: types.CallbackQuery, state: FSMContext) -> No
 async def cb_delete_chat(callback: types.CallbackQuery) -> None:
     """Delete the currently active chat."""
     async with async_session() as session:
-        user = await get_or_create_user(session, callback.from_user.id)
+        user = await get_or_create_user(
+            session, callback.from_user.id, load_active=True
+        )
         if not user.active_profile_id:
             await callback.answer("⚠️ Нет активного чата", show_alert=True)
             return
 
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id,
-            ThreadsProfile.user_id == user.id,
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
-
-        if not profile:
+        profile = user.active_profile
+        if not profile or profile.user_id != user.id:
             await callback.answer("⚠️ Чат не найден", show_alert=True)
             return
 
         name = profile.profile_name
         user.active_profile_id = None
+        user.profile_count = User.profile_count - 1
         await session.delete(profile)
         await session.commit()
 
@@ -419,7 +427,6 @@ async def cb_delete_chat(callback: types.CallbackQuery) -> None:
     await callback.message.edit_text(
         f"🗑 Чат <b>{name}</b> удалён.\n\n"
         "Выберите другой чат или создайте новый:",
-        parse_mode=ParseMode.HTML,
         reply_markup=kb,
     )
     await callback.answer()
@@ -432,15 +439,13 @@ async def cb_delete_chat(callback: types.CallbackQuery) -> None:
 async def cb_edit_style(callback: types.CallbackQuery, state: FSMContext) -> None:
     """Start FSM to edit the active chat's style."""
     async with async_session() as session:
-        user = await get_or_create_user(session, callback.from_user.id)
+        user = await get_or_create_user(
+            session, callback.from_user.id, load_active=True
+        )
         if not user.active_profile_id:
             await callback.answer("⚠️ Нет активного чата", show_alert=True)
             return
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
+        profile = user.active_profile
 
     if not profile:
         await callback.answer("⚠️ Чат не найден", show_alert=True)
@@ -451,7 +456,6 @@ async def cb_edit_style(callback: types.CallbackQuery, state: FSMContext) -> Non
         f"✏️ <b>Редактирование стиля: {profile.profile_name}</b>\n\n"
         f"Текущий стиль:\n<i>{profile.system_prompt[:200]}{'…' if len(profile.system_prompt) > 200 else ''}</i>\n\n"
         "Отправьте новое описание стиля:",
-        parse_mode=ParseMode.HTML,
     )
     await callback.answer()
 
@@ -468,16 +472,14 @@ async def fsm_edit_style(message: types.Message, state: FSMContext) -> None:
         return
 
     async with async_session() as session:
-        user = await get_or_create_user(session, message.from_user.id)
+        user = await get_or_create_user(
+            session, message.from_user.id, load_active=True
+        )
         if not user.active_profile_id:
             await message.answer("⚠️ Нет активного чата")
             await state.clear()
             return
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
+        profile = user.active_profile
         if not profile:
             await message.answer("⚠️ Чат не найден")
             await state.clear()
@@ -493,14 +495,85 @@ async def fsm_edit_style(message: types.Message, state: FSMContext) -> None:
         f"✅ Стиль чата <b>{name}</b> обновлён!\n\n"
         f"🎭 Новый стиль: <i>{new_style[:100]}{'…' if len(new_style) > 100 else ''}</i>\n\n"
         "Контекст очищен. Отправьте тему для генерации.",
-        parse_mode=ParseMode.HTML,
-        reply_markup=active_chat_keyboard(),
+        reply_markup=ACTIVE_CHAT_KB,
     )
 
 
 # ── Text handler (thread generation) ───────────────────────────────────
 
 
+# Strong references to fire-and-forget tasks so they are not GC'd mid-run
+_background_tasks: set[asyncio.Task[None]] = set()
+
+
+def _run_in_background(coro: Coroutine[Any, Any, None]) -> None:
+    """Schedule *coro* without awaiting it, keeping a reference until done."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def drain_background_tasks() -> None:
+    """Wait for pending background tasks (dispatcher shutdown hook)."""
+    while _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
+async def _update_draft(
+    message: types.Message, draft: types.Message | None, text: str
+) -> tuple[types.Message | None, bool]:
+    """Send or edit the streaming preview (plain text, errors ignored).
+
+    Returns the draft message and whether it now shows *text*.
+    """
+    try:
+        if draft is None:
+            return await message.answer(text, parse_mode=None), True
+        await draft.edit_text(text, parse_mode=None)
+    except TelegramAPIError as exc:
+        logger.debug("Draft update failed: %s", exc)
+        return draft, False
+    return draft, True
+
+
+async def _finalize_draft(draft: types.Message, text: str) -> None:
+    """Replace the preview with the final reply, in the default parse mode."""
+    try:
+        await draft.edit_text(text)
+    except TelegramBadRequest as exc:
+        if "not modified" in str(exc):
+            return
+        # e.g. the reply is not valid HTML — show it as plain text instead
+        try:
+            await draft.edit_text(text, parse_mode=None)
+        except TelegramBadRequest as exc:
+            # Already shown as plain text by the last streamed preview
+            if "not modified" not in str(exc):
+                raise
+
+
+async def _discard_draft(draft: types.Message | None) -> None:
+    """Delete the streaming preview, if one was sent."""
+    if draft is None:
+        return
+    try:
+        await draft.delete()
+    except TelegramAPIError as exc:
+        logger.debug("Could not delete draft: %s", exc)
+
+
+async def _persist_context(profile_id: int, topic: str, reply: str) -> None:
+    """Append a topic/reply pair to the profile's stored context."""
+    try:
+        async with async_session() as session:
+            profile = await session.get(ThreadsProfile, profile_id)
+            if profile:
+                profile.add_to_context(topic, reply)
+                await session.commit()
+    except Exception:
+        logger.exception("Failed to save context for profile %s", profile_id)
+
+
 @router.message(F.text)
 async def handle_text(message: types.Message) -> None:
     """Generate a Threads post using the active chat's persona + context."""
@@ -508,25 +581,19 @@ async def handle_text(message: types.Message) -> None:
     if not topic:
         return
 
-    # Check usage limits
+    # Usage check and active-profile lookup share one session
     async with async_session() as session:
-        allowed = await check_and_track_usage(session, message.from_user.id)
+        # Check usage limits (a single atomic upsert)
+        if not await check_and_track_usage(session, message.from_user.id):
+            await message.answer(
+                f"🚫 Дневной лимит в <b>{get_settings().DAILY_FREE_LIMIT}</b> запросов исчерпан.\n"
+                "Перейдите на <b>Pro</b> для безлимитного доступа!",
+            )
+            return
 
-    if not allowed:
-        await message.answer(
-            f"🚫 Дневной лимит в <b>{settings.DAILY_FREE_LIMIT}</b> запросов исчерпан.\n"
-            "Перейдите на <b>Pro</b> для безлимитного доступа!",
-            parse_mode=ParseMode.HTML,
+        user = await get_or_create_user(
+            session, message.from_user.id, load_active=True
         )
-        return
-
-    # Load active profile with context
-    system_prompt = None
-    context = None
-    profile_id = None
-
-    async with async_session() as session:
-        user = await get_or_create_user(session, message.from_user.id)
 
         if not user.active_profile_id:
             kb = await build_chats_keyboard(message.from_user.id, session)
@@ -536,59 +603,92 @@ async def handle_text(message: types.Message) -> None:
             )
             return
 
-        stmt = select(ThreadsProfile).where(
-            ThreadsProfile.id == user.active_profile_id
-        )
-        result = await session.execute(stmt)
-        profile = result.scalar_one_or_none()
-
-        if profile:
-            system_prompt = profile.system_prompt
-            context = profile.get_context()
-            profile_id = profile.id
+        profile = user.active_profile
+        system_prompt = profile.system_prompt if profile else None
+        context = profile.get_context() if profile else None
+        profile_id = profile.id if profile else None
 
     # Show "typing…"
     await message.bot.send_chat_action(
         chat_id=message.chat.id, action="typing"
     )
 
+    # Stream the reply into a plain-text draft message, edited at most once
+    # per STREAM_EDIT_INTERVAL to stay within Telegram's rate limits.
+    loop = asyncio.get_running_loop()
+    parts: list[str] = []
+    draft: types.Message | None = None
+    shown = ""  # text the draft currently displays
+    last_edit = 0.0
     try:
-        thread_text = await generate_thread(
+        async for chunk in generate_thread(
             topic, system_prompt=system_prompt, context=context
-        )
+        ):
+            parts.append(chunk)
+            now = loop.time()
+            if now - last_edit >= STREAM_EDIT_INTERVAL:
+                preview = strip_markdown("".join(parts))[:MAX_MESSAGE_LEN]
+                if preview:
+                    draft, updated = await _update_draft(message, draft, preview)
+                    if updated:
+                        shown = preview
+                    last_edit = now
     except Exception:
         logger.exception("LLM generation failed for user %s", message.from_user.id)
+        await _discard_draft(draft)
         await message.answer(
             "⚠️ Произошла ошибка при генерации. Попробуйте позже."
         )
         return
 
+    # Clean markdown formatting; a reply of markup symbols only is empty
+    thread_text = strip_markdown("".join(parts))
     if not thread_text:
+        await _discard_draft(draft)
         await message.answer("⚠️ ИИ вернул пустой ответ. Попробуйте переформулировать.")
         return
 
-    # Clean markdown formatting
-    thread_text = strip_markdown(thread_text)
-
-    # Split into variants by ===
-    variants = [v.strip() for v in thread_text.split("===") if v.strip()]
-
-    # Save to context
+    # Save to context in the background; the reply does not depend on it
     if profile_id:
-        async with async_session() as session:
-            stmt = select(ThreadsProfile).where(ThreadsProfile.id == profile_id)
-            result = await session.execute(stmt)
-            profile = result.scalar_one_or_none()
-            if profile:
-                profile.add_to_context(topic, thread_text)
-                await session.commit()
+        _run_in_background(_persist_context(profile_id, topic, thread_text))
 
-    # Send each variant as a separate message
-    if len(variants) > 1:
-        for idx, variant in enumerate(variants, 1):
-            await message.answer(f"📝 Вариант {idx}\n\n{variant}")
+    # Split into variants by === (most replies are a single post)
+    if "===" in thread_text:
+        variants = [v for v in (s.strip() for s in thread_text.split("===")) if v]
     else:
-        # Single response
-        for i in range(0, len(thread_text), 4000):
-            await message.answer(thread_text[i : i + 4000])
+        variants = [thread_text]
+
+    # A single short reply replaces the draft in place; anything that
+    # needs several messages is sent fresh and the draft is removed.
+    if draft is not None:
+        if len(variants) == 1 and len(thread_text) <= MAX_MESSAGE_LEN:
+            # Skip the edit if the plain preview already is the final text
+            # and there is no HTML markup (tags or entities) to render.
+            if thread_text != shown or any(c in thread_text for c in "<&"):
+                await _finalize_draft(draft, thread_text)
+            return
+        await _discard_draft(draft)
 
+    # Send each variant as a separate message.  They are numbered, so they
+    # are sent concurrently rather than one Telegram round-trip at a time.
+    if len(variants) > 1:
+        results = await asyncio.gather(
+            *(
+                message.answer(f"📝 Вариант {idx}\n\n{variant}")
+                for idx, variant in enumerate(variants, 1)
+            ),
+            return_exceptions=True,
+        )
+        for idx, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to send variant %d to user %s: %s",
+                    idx, message.from_user.id, result,
+                )
+    else:
+        # Single response, split only when it exceeds one Telegram message
+        if len(thread_text) <= MAX_MESSAGE_LEN:
+            await message.answer(thread_text)
+        else:
+            for start in range(0, len(thread_text), MAX_MESSAGE_LEN):
+                await message.answer(thread_text[start : start + MAX_MESSAGE_LEN])
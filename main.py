@@ -1,102 +1,166 @@
 """
 Threads Copilot Bot — entry point.
 
-Supports both Long Polling (local) and Webhooks (production).
+Supports both Long Polling (local) and Webhooks (production, served as an
+ASGI app by uvicorn).
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
+import logging.handlers
+import queue
 import sys
 
-from aiohttp import web
+import orjson
+import uvicorn
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeChat
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
-from config import settings
+from config import get_settings
 from database.session import init_db
 from handlers.admin import router as admin_router
-from handlers.user import router as user_router
+from handlers.user import drain_background_tasks, router as user_router
+from services.ai import close_client, load_tokenizer
+from services.usage import start_today_refresher, stop_today_refresher
+from webhook import WebhookApp
+
+try:
+    import uvloop  # faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
 
-# ── Logging ─────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-    stream=sys.stdout,
-)
 logger = logging.getLogger(__name__)
 
+WEBHOOK_PATH = "/webhook"
+
+
+# ── Command menus ───────────────────────────────────────────────────────
+PUBLIC_COMMANDS: tuple[BotCommand, ...] = (
+    BotCommand(command="start", description="🚀 Запустить бота"),
+    BotCommand(command="chats", description="📋 Мои чаты"),
+    BotCommand(command="switch", description="🔀 Сменить чат"),
+    BotCommand(command="clear", description="🗑 Очистить контекст"),
+    BotCommand(command="pro_status", description="📊 Статус подписки"),
+)
+ADMIN_COMMANDS: tuple[BotCommand, ...] = PUBLIC_COMMANDS + (
+    BotCommand(command="admin_promote", description="👑 Выдать Pro (админ)"),
+)
+
+
+def _orjson_dumps(obj: object) -> str:
+    """``json.dumps`` replacement for aiogram (which expects ``str``)."""
+    return orjson.dumps(obj).decode()
+
 
 async def setup_commands(bot: Bot) -> None:
     """Register bot commands."""
     # Public command menu
-    await bot.set_my_commands([
-        BotCommand(command="start", description="🚀 Запустить бота"),
-        BotCommand(command="chats", description="📋 Мои чаты"),
-        BotCommand(command="switch", description="🔀 Сменить чат"),
-        BotCommand(command="clear", description="🗑 Очистить контекст"),
-        BotCommand(command="pro_status", description="📊 Статус подписки"),
-    ])
-
-    # Admin commands
-    admin_commands = [
-        BotCommand(command="start", description="🚀 Запустить бота"),
-        BotCommand(command="chats", description="📋 Мои чаты"),
-        BotCommand(command="switch", description="🔀 Сменить чат"),
-        BotCommand(command="clear", description="🗑 Очистить контекст"),
-        BotCommand(command="pro_status", description="📊 Статус подписки"),
-        BotCommand(command="admin_promote", description="👑 Выдать Pro (админ)"),
-    ]
-    for admin_id in settings.admin_ids_list:
-        try:
-            await bot.set_my_commands(
+    await bot.set_my_commands(list(PUBLIC_COMMANDS))
+
+    # Admin command menu: one request per admin, sent concurrently
+    admin_commands = list(ADMIN_COMMANDS)
+    admin_ids = list(get_settings().admin_ids_set)
+    results = await asyncio.gather(
+        *(
+            bot.set_my_commands(
                 admin_commands,
                 scope=BotCommandScopeChat(chat_id=admin_id),
             )
-        except Exception:
-            logger.warning("Could not set commands for admin %s", admin_id)
+            for admin_id in admin_ids
+        ),
+        return_exceptions=True,
+    )
+    for admin_id, result in zip(admin_ids, results):
+        if isinstance(result, Exception):
+            logger.warning("Could not set commands for admin %s: %s", admin_id, result)
 
 
 async def on_startup(bot: Bot) -> None:
     """Startup hook for Webhook mode."""
     logger.info("Starting up (Webhook mode)...")
-    await init_db()
-    await setup_commands(bot)
-    
-    webhook_url = f"{settings.WEBHOOK_URL}/webhook"
+    webhook_url = f"{get_settings().WEBHOOK_URL}{WEBHOOK_PATH}"
     logger.info("Setting webhook: %s", webhook_url)
-    await bot.set_webhook(
-        webhook_url,
-        drop_pending_updates=True,
+
+    # Independent steps: run them concurrently.  uvicorn only serves
+    # requests once this hook returns, so no update sees a missing schema.
+    await asyncio.gather(
+        init_db(),
+        setup_commands(bot),
+        bot.set_webhook(webhook_url, drop_pending_updates=True),
+    )
+
+
+def _setup_logging() -> logging.handlers.QueueListener:
+    """Route logging through a queue; return the (unstarted) listener.
+
+    Records are formatted and queued by the caller, then written to stdout
+    by the listener thread, so logging never blocks the event loop on I/O.
+    """
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+    )
+    return logging.handlers.QueueListener(
+        log_queue, logging.StreamHandler(sys.stdout)
     )
 
 
 def main() -> None:
     """Application entry-point."""
+    log_listener = _setup_logging()
+    log_listener.start()
+    try:
+        _run()
+    finally:
+        log_listener.stop()
+
+
+def _run() -> None:
+    """Build the bot and serve it in webhook or polling mode."""
+    settings = get_settings()
+
     # Common setup
     bot = Bot(
         token=settings.BOT_TOKEN,
+        # orjson instead of stdlib json for Bot API requests / responses
+        session=AiohttpSession(
+            json_loads=orjson.loads,
+            json_dumps=_orjson_dumps,
+        ),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
     dp = Dispatcher(storage=MemoryStorage())
     dp.include_router(admin_router)
     dp.include_router(user_router)
+    dp.startup.register(start_today_refresher)
+    dp.startup.register(load_tokenizer)
+    # Finish pending context writes before anything is closed
+    dp.shutdown.register(drain_background_tasks)
+    dp.shutdown.register(stop_today_refresher)
+    dp.shutdown.register(close_client)
 
     # ── Webhook Mode ────────────────────────────────────────────────────
     if settings.WEBHOOK_URL:
         dp.startup.register(on_startup)
-        
-        app = web.Application()
-        SimpleRequestHandler(dispatcher=dp, bot=bot).register(app, path="/webhook")
-        setup_application(app, dp, bot=bot)
-        
+
+        app = WebhookApp(bot, dp, path=WEBHOOK_PATH)
+
         logger.info("Starting Webhook server on port %s...", settings.PORT)
-        web.run_app(app, host="0.0.0.0", port=settings.PORT)
+        uvicorn.run(
+            app,
+            host="0.0.0.0",
+            port=settings.PORT,
+            loop="uvloop" if uvloop is not None else "asyncio",
+            workers=1,
+        )
 
     # ── Polling Mode ────────────────────────────────────────────────────
     else:
@@ -104,12 +168,17 @@ def main() -> None:
         
         async def run_polling():
             logger.info("Initialising database…")
-            await init_db()
-            await setup_commands(bot)
-            await bot.delete_webhook(drop_pending_updates=True)
+            await asyncio.gather(
+                init_db(),
+                setup_commands(bot),
+                bot.delete_webhook(drop_pending_updates=True),
+            )
             await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
-        asyncio.run(run_polling())
+        if uvloop is not None:
+            uvloop.run(run_polling())
+        else:
+            asyncio.run(run_polling())
 
 
 if __name__ == "__main__":
@@ -2,30 +2,76 @@
 AI service — generates Threads-style posts via OpenRouter.
 
 Uses the ``openai`` library pointed at OpenRouter's API-compatible endpoint.
+Replies are streamed so callers can show text as soon as it is generated.
 """
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import logging
 import re
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable
 
+import httpx
+import tiktoken
 from openai import AsyncOpenAI
 
-from config import settings
+from config import get_settings
+
 
 logger = logging.getLogger(__name__)
 
+# Per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+# tiktoken encoding, set by ``load_tokenizer`` (never loaded on the loop);
+# tokens are estimated until it is available.
+_encoding: tiktoken.Encoding | None = None
+_tokenizer_task: asyncio.Task[None] | None = None
+
+# Replies to context-free short requests, keyed by
+# (system prompt digest, normalised topic); most recently used last.
+REPLY_CACHE_SIZE = 1024
+_REPLY_CACHE: OrderedDict[tuple[str, str], str] = OrderedDict()
+
 # ── OpenRouter-compatible async client ──────────────────────────────────
+# One shared HTTP/2 connection pool: concurrent completions are multiplexed
+# over a single TLS session instead of opening a new connection each.
+_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_keepalive_connections=64,
+        max_connections=128,
+        keepalive_expiry=60,
+    ),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
 client = AsyncOpenAI(
-    api_key=settings.OPENROUTER_API_KEY,
+    api_key=get_settings().OPENROUTER_API_KEY,
     base_url="https://openrouter.ai/api/v1",
+    http_client=_http,
 )
 
+
+async def close_client() -> None:
+    """Close the shared HTTP connection pool (call on shutdown)."""
+    await client.close()
+
+
 # ── Keywords that trigger "long post" mode ──────────────────────────────
-_LONG_KEYWORDS = re.compile(
-    r"напиши\s+пост|развёрни|разверни|длинн|полн\w+\s+пост|подробн|ветк|тред",
-    re.IGNORECASE,
-)
+# Plain substrings are checked with ``in`` on the lowercased topic; only the
+# two multi-word phrases need a (narrow) regex.
+_LONG_LITERALS = ("развёрни", "разверни", "длинн", "подробн", "ветк", "тред")
+_LONG_RX = re.compile(r"напиши\s+пост|полн\w+\s+пост", re.IGNORECASE)
+
+
+def _wants_long(topic: str) -> bool:
+    """Return True if the topic asks for a full post / thread."""
+    low = topic.lower()
+    return any(kw in low for kw in _LONG_LITERALS) or bool(_LONG_RX.search(topic))
+
 
 # ── Default system prompt with few-shot examples ────────────────────────
 DEFAULT_SYSTEM_PROMPT = (
@@ -71,37 +117,156 @@ DEFAULT_SYSTEM_PROMPT = (
 )
 
 
+def _load_encoding() -> None:
+    """Load the tiktoken encoding (blocking: may download the BPE file)."""
+    global _encoding
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("tiktoken encoding unavailable, estimating tokens")
+        return
+    # Drop the estimates memoised while the encoding was loading
+    _count_tokens.cache_clear()
+
+
+async def load_tokenizer() -> None:
+    """Start loading the tokenizer in a thread (dispatcher startup hook).
+
+    Does not wait for it: a cold tiktoken cache means a download, which must
+    not hold up startup.
+    """
+    global _tokenizer_task
+    if _encoding is None and _tokenizer_task is None:
+        _tokenizer_task = asyncio.create_task(asyncio.to_thread(_load_encoding))
+
+
+@functools.lru_cache(maxsize=4096)
+def _count_tokens(text: str) -> int:
+    """Return the prompt tokens a message with *text* costs, memoised.
+
+    Context messages and system prompts repeat on every request of a chat,
+    so each is encoded only once.
+    """
+    if _encoding is None:
+        return len(text) // 2 + 1  # pessimistic for Cyrillic text
+    return len(_encoding.encode(text)) + _MESSAGE_OVERHEAD_TOKENS
+
+
+@functools.lru_cache(maxsize=256)
+def _prompt_digest(system_prompt: str) -> str:
+    """Short stable digest of a system prompt (reply-cache key part)."""
+    return hashlib.blake2b(system_prompt.encode(), digest_size=16).hexdigest()
+
+
+def _fit_context(
+    context: list[dict[str, str]],
+    used_tokens: int,
+    budget: int,
+) -> tuple[list[dict[str, str]], int]:
+    """Drop the oldest context turns until the prompt fits in *budget*.
+
+    Returns the kept messages and the resulting prompt size in tokens.
+    """
+    sizes = [_count_tokens(m["content"]) for m in context]
+    total = used_tokens + sum(sizes)
+    start = 0
+    while total > budget and start < len(context):
+        # Context is stored as (user, assistant) pairs: drop whole turns
+        total -= sum(sizes[start:start + 2])
+        start += 2
+    return context[start:], total
+
+
+# Shared system message for the default prompt (only read, never mutated)
+_DEFAULT_SYSTEM_MSG: dict[str, str] = {
+    "role": "system", "content": DEFAULT_SYSTEM_PROMPT,
+}
+
+
 async def generate_thread(
     topic: str,
     system_prompt: str | None = None,
-    context: list[dict[str, str]] | None = None,
-) -> str:
-    """Call the LLM and return the generated thread text."""
+    context: Iterable[dict[str, str]] | None = None,
+) -> AsyncIterator[str]:
+    """Call the LLM and yield the generated thread text chunk by chunk.
+
+    A repeated context-free short request is answered from the reply cache
+    as a single chunk.
+    """
     # Pick token limit based on whether user wants a full post
-    wants_long = bool(_LONG_KEYWORDS.search(topic))
+    wants_long = _wants_long(topic)
     token_limit = 1500 if wants_long else 600
 
-    messages: list[dict[str, str]] = [
-        {"role": "system", "content": system_prompt or DEFAULT_SYSTEM_PROMPT},
-    ]
+    system_msg = (
+        {"role": "system", "content": system_prompt}
+        if system_prompt
+        else _DEFAULT_SYSTEM_MSG
+    )
+    prompt_tokens = _count_tokens(system_msg["content"]) + _count_tokens(topic)
+
+    messages: list[dict[str, str]] = [system_msg]
+    history = list(context) if context is not None else []
+
+    # Identical one-off requests (no chat history, short post) are answered
+    # from the reply cache without calling the LLM.
+    cache_key: tuple[str, str] | None = None
+    if not history and not wants_long:
+        cache_key = (_prompt_digest(system_msg["content"]), topic.strip().lower())
+        cached = _REPLY_CACHE.get(cache_key)
+        if cached is not None:
+            _REPLY_CACHE.move_to_end(cache_key)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Reply cache hit (%d chars)", len(cached))
+            yield cached
+            return
 
-    if context:
-        messages.extend(context)
+    # Prompt + reply must fit in the model's context window
+    budget = get_settings().AI_CONTEXT_WINDOW - token_limit
+    if history:
+        # Keep the newest turns that leave room for the reply
+        kept, prompt_tokens = _fit_context(history, prompt_tokens, budget)
+        messages.extend(kept)
+
+    if prompt_tokens > budget:
+        logger.warning(
+            "Prompt of %d tokens leaves no room for a %d-token reply "
+            "(AI_CONTEXT_WINDOW=%d)",
+            prompt_tokens, token_limit, get_settings().AI_CONTEXT_WINDOW,
+        )
+        raise ValueError("Prompt does not fit in the model context window")
 
     messages.append({"role": "user", "content": topic})
 
-    logger.info(
-        "Calling %s with %d chars (max_tokens=%d)",
-        settings.AI_MODEL, len(topic), token_limit,
-    )
+    # Per-call logging is DEBUG only; the guard also skips building the args
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Calling %s with %d chars (max_tokens=%d)",
+            get_settings().AI_MODEL, len(topic), token_limit,
+        )
 
-    response = await client.chat.completions.create(
-        model=settings.AI_MODEL,
+    stream = await client.chat.completions.create(
+        model=get_settings().AI_MODEL,
         messages=messages,
         max_tokens=token_limit,
         temperature=0.8,
+        stream=True,
     )
 
-    text: str = response.choices[0].message.content or ""
-    logger.info("Received %d chars from LLM", len(text))
-    return text.strip()
+    parts: list[str] = []
+    async for chunk in stream:
+        # Some providers send trailing chunks without choices (e.g. usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    reply = "".join(parts)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received %d chars from LLM", len(reply))
+
+    if cache_key is not None and reply.strip():
+        _REPLY_CACHE[cache_key] = reply
+        if len(_REPLY_CACHE) > REPLY_CACHE_SIZE:
+            _REPLY_CACHE.popitem(last=False)
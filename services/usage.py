@@ -1,48 +1,245 @@
 """
 Usage-tracking service for the freemium billing model.
 
-Provides ``check_and_track_usage`` which enforces daily request limits
-for free users while allowing unlimited access for Pro subscribers.
+Provides ``check_and_track_usage`` which enforces daily request limits for
+free users while allowing unlimited access for Pro subscribers.
 """
 
 from __future__ import annotations
 
+import asyncio
 import datetime
 import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import case, event, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    Session,
+    joinedload,
+    make_transient_to_detached,
+    object_session,
+)
+from sqlalchemy.orm.attributes import set_committed_value
 
-from config import settings
-from database.models import User
+from config import get_settings
+from database.models import ThreadsProfile, User
+from database.session import engine
+
+# Both dialects offer INSERT … ON CONFLICT … RETURNING with the same API
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert
+else:
+    from sqlalchemy.dialects.sqlite import insert
 
 logger = logging.getLogger(__name__)
 
+# Today's (local) date, refreshed at midnight by ``start_today_refresher``
+# instead of calling ``date.today()`` on every request.
+_TODAY: datetime.date = datetime.date.today()
+_today_task: asyncio.Task[None] | None = None
+
+# telegram_id → column values of the users row, most recently used last.
+# Entries are refreshed by the usage upsert and evicted when an ORM update
+# of the user commits.  Each commit that evicts bumps ``_cache_generation``;
+# a read started before it (which may have seen the old row) is not cached.
+USER_CACHE_SIZE = 10_000
+_USER_CACHE: OrderedDict[int, dict[str, Any]] = OrderedDict()
+_USER_COLUMNS = tuple(User.__table__.c)
+_cache_generation = 0
+
+
+def _remember(
+    telegram_id: int, values: Mapping[str, Any], generation: int
+) -> None:
+    """Store a user's column values in the LRU cache.
+
+    *generation* is ``_cache_generation`` as of before the values were
+    read; if a user write committed since, they may be stale and are
+    dropped.
+    """
+    if generation != _cache_generation:
+        return
+    _USER_CACHE[telegram_id] = dict(values)
+    _USER_CACHE.move_to_end(telegram_id)
+    if len(_USER_CACHE) > USER_CACHE_SIZE:
+        _USER_CACHE.popitem(last=False)
+
+
+@event.listens_for(User, "after_update")
+def _evict_updated_user(_mapper, _connection, target: User) -> None:
+    """Evict a user updated through the ORM, again once the write commits."""
+    _USER_CACHE.pop(target.telegram_id, None)
+    object_session(target).info.setdefault("updated_users", set()).add(
+        target.telegram_id
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_users(session: Session) -> None:
+    """Drop users whose update just committed (and any row read meanwhile)."""
+    global _cache_generation
+    updated = session.info.pop("updated_users", None)
+    if updated:
+        _cache_generation += 1
+        for telegram_id in updated:
+            _USER_CACHE.pop(telegram_id, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    """Rolled-back updates never reach the database: nothing to evict."""
+    session.info.pop("updated_users", None)
+
+
+async def _refresh_today() -> None:
+    """Update ``_TODAY`` every local midnight."""
+    global _TODAY
+    while True:
+        _TODAY = datetime.date.today()
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(
+            _TODAY + datetime.timedelta(days=1), datetime.time()
+        )
+        await asyncio.sleep((midnight - now).total_seconds())
+
+
+async def start_today_refresher() -> None:
+    """Start the midnight date refresher (dispatcher startup hook)."""
+    global _today_task
+    if _today_task is None:
+        _today_task = asyncio.create_task(_refresh_today())
+
+
+async def stop_today_refresher() -> None:
+    """Cancel the midnight date refresher (dispatcher shutdown hook)."""
+    global _today_task
+    if _today_task is not None:
+        _today_task.cancel()
+        _today_task = None
+
+
+async def get_user(
+    session: AsyncSession,
+    telegram_id: int,
+    *,
+    load_active: bool = False,
+) -> User | None:
+    """Return the user with *telegram_id*, or ``None``.  Never writes.
+
+    Recently seen users are rebuilt from ``_USER_CACHE`` without querying
+    the users table.  With ``load_active=True`` the ``active_profile``
+    relationship is loaded too (joined-loaded on a cache miss, so the user
+    and its active chat arrive in one SELECT).
+    """
+    cached = _USER_CACHE.get(telegram_id)
+    if cached is not None:
+        _USER_CACHE.move_to_end(telegram_id)
+        return await _attach_cached(session, cached, load_active)
+
+    generation = _cache_generation
+    options = (joinedload(User.active_profile),) if load_active else ()
+    stmt = select(User).where(User.telegram_id == telegram_id).options(*options)
+    user = await session.scalar(stmt)
+
+    if user is not None:
+        _remember(telegram_id, _column_values(user), generation)
+    return user
+
 
 async def get_or_create_user(
     session: AsyncSession,
     telegram_id: int,
+    *,
+    load_active: bool = False,
 ) -> User:
-    """Return the existing user or create a new one."""
-    stmt = select(User).where(User.telegram_id == telegram_id)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
-
+    """Return the existing user or create a new one (see ``get_user``)."""
+    user = await get_user(session, telegram_id, load_active=load_active)
     if user is None:
-        user = User(
-            telegram_id=telegram_id,
-            is_pro=False,
-            requests_today=0,
-            last_request_date=datetime.date.today(),
-        )
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        logger.info("Registered new user tg_id=%s", telegram_id)
+        user = await _create_user(session, telegram_id)
+    return user
+
 
+async def _create_user(session: AsyncSession, telegram_id: int) -> User:
+    """Insert and commit a new free-tier user."""
+    # Every column is set here, so no refresh() is needed after INSERT
+    user = User(
+        telegram_id=telegram_id,
+        is_pro=False,
+        requests_today=0,
+        profile_count=0,
+        last_request_date=_TODAY,
+        active_profile_id=None,
+    )
+    generation = _cache_generation
+    session.add(user)
+    await session.commit()
+    set_committed_value(user, "active_profile", None)
+    logger.info("Registered new user tg_id=%s", telegram_id)
+
+    _remember(telegram_id, _column_values(user), generation)
     return user
 
 
+def _column_values(user: User) -> dict[str, Any]:
+    """Return the users-table column values of a loaded *user*."""
+    return {c.key: getattr(user, c.key) for c in _USER_COLUMNS}
+
+
+async def _attach_cached(
+    session: AsyncSession,
+    values: Mapping[str, Any],
+    load_active: bool,
+) -> User:
+    """Rebuild a cached user as a persistent instance without a SELECT."""
+    user = User()
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    user = await session.merge(user, load=False)
+
+    if load_active:
+        profile = (
+            await session.get(ThreadsProfile, user.active_profile_id)
+            if user.active_profile_id is not None
+            else None
+        )
+        set_committed_value(user, "active_profile", profile)
+    return user
+
+
+def _upsert_usage(telegram_id: int, today: datetime.date, limit: int | None):
+    """Build the dialect-specific ``INSERT … ON CONFLICT DO UPDATE``.
+
+    Registers the user on first contact and bumps the counter otherwise,
+    resetting it on a new day.  With a *limit*, the update only applies to
+    Pro users, a new day, or ``requests_today < limit``; a denied request
+    therefore returns no row.
+    """
+    new_day = User.last_request_date < today
+    stmt = insert(User).values(
+        telegram_id=telegram_id,
+        is_pro=False,
+        requests_today=1,
+        profile_count=0,
+        last_request_date=today,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            "requests_today": case((new_day, 1), else_=User.requests_today + 1),
+            "last_request_date": today,
+        },
+        where=(
+            None
+            if limit is None
+            else or_(User.is_pro, new_day, User.requests_today < limit)
+        ),
+    ).returning(*_USER_COLUMNS)
+
+
 async def check_and_track_usage(
     session: AsyncSession,
     telegram_id: int,
@@ -50,43 +247,38 @@ async def check_and_track_usage(
     """Check whether the user may make a request.  If yes, increment the
     counter and return ``True``; otherwise return ``False``.
 
+    The check and the increment are a single atomic upsert (one round-trip),
+    which also registers unknown users.  Commits the session.
+
     Rules
     -----
-    1. If ``last_request_date`` is before today → reset ``requests_today``
-       to 0 (new day).
-    2. Pro users → always allowed.
-    3. Free users with ``requests_today < DAILY_FREE_LIMIT`` → allowed.
-    4. Otherwise → denied.
+    1. Admins → always allowed (survives DB reset).
+    2. If ``last_request_date`` is before today → reset ``requests_today``
+       (new day).
+    3. Pro users → always allowed.
+    4. Free users with ``requests_today < DAILY_FREE_LIMIT`` → allowed.
+    5. Otherwise → denied.
     """
-    user = await get_or_create_user(session, telegram_id)
-    today = datetime.date.today()
-
-    # Admins always bypass limits (survives DB reset)
-    if telegram_id in settings.admin_ids_list:
-        user.requests_today += 1
-        user.last_request_date = today
-        await session.commit()
-        return True
-
-    # Reset counter on a new calendar day
-    if user.last_request_date < today:
-        user.requests_today = 0
-        user.last_request_date = today
-
-    # Pro users bypass limits
-    if user.is_pro:
-        user.requests_today += 1
-        await session.commit()
-        return True
+    settings = get_settings()
+    limit = None if telegram_id in settings.admin_ids_set else settings.DAILY_FREE_LIMIT
+    if limit is not None and limit <= 0:
+        # No free requests: the upsert's INSERT branch would admit an unknown
+        # user, so only existing (possibly Pro) users go through it.
+        if await get_user(session, telegram_id) is None:
+            return False
+
+    generation = _cache_generation
+    stmt = _upsert_usage(telegram_id, _TODAY, limit)
+    row = (await session.execute(stmt)).one_or_none()
+    await session.commit()
 
-    # Free-tier check
-    if user.requests_today < settings.DAILY_FREE_LIMIT:
-        user.requests_today += 1
-        await session.commit()
-        return True
+    if row is None:
+        # Limit reached
+        return False
 
-    # Limit reached
-    return False
+    # RETURNING gives the whole updated row: refresh the cache with it
+    _remember(telegram_id, row._mapping, generation)
+    return True
 
 
 async def get_remaining_requests(
@@ -95,15 +287,18 @@ async def get_remaining_requests(
 ) -> tuple[bool, int]:
     """Return ``(is_pro, remaining_requests_today)`` for a user.
 
-    For Pro users ``remaining`` is set to ``-1`` (unlimited).
+    For Pro users ``remaining`` is set to ``-1`` (unlimited).  Read-only:
+    unknown users get the full free quota and are registered on their first
+    request instead.
     """
-    user = await get_or_create_user(session, telegram_id)
-    today = datetime.date.today()
+    user = await get_user(session, telegram_id)
+    if user is None:
+        return False, get_settings().DAILY_FREE_LIMIT
 
-    used = user.requests_today if user.last_request_date >= today else 0
+    used = user.requests_today if user.last_request_date >= _TODAY else 0
 
     if user.is_pro:
         return True, -1
 
-    remaining = max(settings.DAILY_FREE_LIMIT - used, 0)
+    remaining = max(get_settings().DAILY_FREE_LIMIT - used, 0)
     return False, remaining
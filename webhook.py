@@ -0,0 +1,128 @@
+"""
+ASGI adapter for Telegram webhook updates.
+
+``WebhookApp`` is a minimal ASGI application that accepts Telegram's
+webhook POSTs and feeds them into an aiogram ``Dispatcher``.  It replaces
+aiogram's aiohttp request handler so the bot can be served by uvicorn.
+
+Usage
+-----
+    app = WebhookApp(bot, dp, path="/webhook")
+    uvicorn.run(app, host="0.0.0.0", port=8080)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, MutableMapping
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+
+class WebhookApp:
+    """ASGI app: lifespan → dispatcher startup/shutdown, POST → update."""
+
+    def __init__(self, bot: Bot, dispatcher: Dispatcher, path: str) -> None:
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.path = path
+        # Strong references to in-flight updates (handled in background)
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            await self._handle_http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+
+    # ── Lifespan ────────────────────────────────────────────────────────
+
+    async def _handle_lifespan(self, receive: Receive, send: Send) -> None:
+        """Run the dispatcher's startup/shutdown hooks with the server."""
+        workflow_data = {
+            "dispatcher": self.dispatcher,
+            "bot": self.bot,
+            **self.dispatcher.workflow_data,
+        }
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.dispatcher.emit_startup(**workflow_data)
+                except Exception as exc:
+                    logger.exception("Startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._tasks:
+                    await asyncio.gather(*self._tasks, return_exceptions=True)
+                await self.dispatcher.emit_shutdown(**workflow_data)
+                await self.bot.session.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ── HTTP ────────────────────────────────────────────────────────────
+
+    async def _handle_http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Accept an update, answer ``{}`` at once, process it in background."""
+        if scope["path"] != self.path:
+            await _respond(send, 404)
+            return
+        if scope["method"] != "POST":
+            await _respond(send, 405)
+            return
+
+        body = await _read_body(receive)
+        try:
+            # Parse + validate in one native (pydantic-core) pass over the
+            # raw bytes, without building an intermediate dict.
+            update = Update.model_validate_json(body, context={"bot": self.bot})
+        except ValueError:
+            await _respond(send, 400)
+            return
+
+        task = asyncio.create_task(self._feed_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        await _respond(send, 200, b"{}")
+
+    async def _feed_update(self, update: Update) -> None:
+        """Dispatch one update; send its webhook reply (if any) via the API."""
+        try:
+            result = await self.dispatcher.feed_update(self.bot, update)
+            if isinstance(result, TelegramMethod):
+                await self.dispatcher.silent_call_request(self.bot, result)
+        except Exception:
+            logger.exception("Failed to process update")
+
+
+async def _read_body(receive: Receive) -> bytes:
+    """Collect the full request body from ASGI ``http.request`` messages."""
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _respond(send: Send, status: int, body: bytes = b"") -> None:
+    """Send a complete (JSON) response."""
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})